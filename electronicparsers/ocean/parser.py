@@ -16,14 +16,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import re
 import numpy as np
 import json
+import orjson
 import os
 import logging
 from ase.data import chemical_symbols
 
 from nomad.units import ureg
-from nomad.parsing.file_parser import DataTextParser, TextParser, Quantity
+from nomad.parsing.file_parser import TextParser
 from nomad.datamodel.metainfo.simulation.run import Run, Program
 from nomad.datamodel.metainfo.simulation.system import System, Atoms
 from nomad.datamodel.metainfo.simulation.method import (
@@ -40,32 +42,44 @@ from .metainfo.ocean import (
 )
 
 
-class PhotonParser(TextParser):
-    def __init__(self):
-        super().__init__(None)
+chemical_symbols_array = np.array(chemical_symbols)
 
-    def init_quantities(self):
-        self._quantities = [
-            Quantity('operator', r'^(dipole|quad|NRIXS)', repeats=False),
-            Quantity('vectors', r'cartesian([\s\d\.]+)', repeats=True),
-            Quantity('photon_energy', r'end[\n\r]([\d\.]+)', repeats=False)]
 
+class PhotonParser(TextParser):
+    # photon files are small and fixed in structure, all quantities are read in a single scan
+    _re_photon = re.compile(
+        rb'^(?P<operator>dipole|quad|NRIXS)|'
+        rb'cartesian[ \t]+(?P<vectors>[\-\+]?\.?\d[\d\.Ee\-\+]*(?:[ \t]+[\-\+]?\.?\d[\d\.Ee\-\+]*)*)|'
+        rb'end[\r\n]+(?P<photon_energy>[\d\.]+)', re.MULTILINE)
 
-class LanczosParser(TextParser):
     def __init__(self):
         super().__init__(None)
 
-    def init_quantities(self):
-        self._quantities = [
-            Quantity('data', r'(.*[\s\S]+?)(?:.)', repeats=True)]
+    def parse(self, key=None):
+        if self._results is None:
+            self._results = dict()
+        if self._results or self.file_mmap is None:
+            return self
+
+        vectors = []
+        for match in self._re_photon.finditer(self.file_mmap):
+            if match.group('vectors'):
+                vectors.append(np.array(match.group('vectors').split(), dtype=np.float64))
+            elif match.group('operator') and 'operator' not in self._results:
+                self._results['operator'] = match.group('operator').decode()
+            elif match.group('photon_energy') and 'photon_energy' not in self._results:
+                self._results['photon_energy'] = float(match.group('photon_energy'))
+        if vectors:
+            self._results['vectors'] = vectors
+        return self
 
 
 class OceanParser:
     def __init__(self):
         self.photon_parser = PhotonParser()
-        self.spectra_parser = DataTextParser()
-        self.lanczos_parser = LanczosParser()
         self._child_archives = {}
+        self._maindir_files = {}
+        self._photon_cache = {}
         self._calculation_type = 'bse'
         self._photon_workflow_level = 0
         self._dft_code_map = {
@@ -78,39 +92,53 @@ class OceanParser:
         }
         self.mode_bse = ['emission', 'absorption']
         self._core_level_map = {
-            '[1, 0]': 'K',
-            '[2, 1]': 'L23'
+            (1, 0): 'K',
+            (2, 1): 'L23'
         }
 
     def parse_system(self, path, data):
         sec_run = self._child_archives.get(path).run[-1]
         sec_atoms = sec_run.m_create(System).m_create(Atoms)
 
-        if data.get('avecs'):
-            sec_atoms.lattice_vectors = data.get('avecs') * ureg.bohr
-            sec_atoms.periodic = [data.get('avecs')[:] is not None] * 3
-        if data.get('bvecs'):
-            sec_atoms.lattice_vectors_reciprocal = np.array(data.get('bvecs')) / ureg.bohr
-
-        if data.get('znucl') and data.get('typat'):
-            sec_atoms.labels = [chemical_symbols[int(data.get('znucl')[n_at - 1])] for n_at in data.get('typat')]
-        if data.get('xangst'):
-            sec_atoms.positions = data.get('xangst') * ureg.bohr
+        avecs = data.get('avecs')
+        if avecs:
+            sec_atoms.lattice_vectors = ureg.Quantity(np.ascontiguousarray(avecs, dtype=np.float64), ureg.bohr)
+            # the structure is periodic along all the given lattice vectors
+            sec_atoms.periodic = [True, True, True]
+        bvecs = data.get('bvecs')
+        if bvecs:
+            sec_atoms.lattice_vectors_reciprocal = ureg.Quantity(
+                np.ascontiguousarray(bvecs, dtype=np.float64), 1 / ureg.bohr)
+
+        znucl, typat = data.get('znucl'), data.get('typat')
+        if znucl and typat:
+            znucl = np.asarray(znucl, dtype=int)
+            sec_atoms.labels = chemical_symbols_array[znucl[np.asarray(typat, dtype=int) - 1]].tolist()
+        xangst = data.get('xangst')
+        if xangst:
+            sec_atoms.positions = ureg.Quantity(np.ascontiguousarray(xangst, dtype=np.float64), ureg.bohr)
 
     def parse_photon_polarization(self, path):
-        sec_run = self._child_archives.get(path).run[-1]
-        sec_photon = sec_run.m_create(Method).m_create(Photon)
-
         # NOT IDEAL: photonN should be in the same folder: patch due for the upload mr5PRdbVQUm-d7awz3Q9Uw
-        photon_file = [f for f in os.listdir(self.maindir) if f.startswith('photon') and f.endswith(path[-1:])]
+        photon_file = [f for f in self._maindir_files['photon'] if f.endswith(path[-1:])]
         if len(photon_file) == 0:
             return
-        self.photon_parser.mainfile = os.path.join(self.maindir, photon_file[0])
-        sec_photon.multipole_type = self.photon_parser.get('operator')
-        sec_photon.polarization = self.photon_parser.get('vectors')[0]
+        sec_run = self._child_archives.get(path).run[-1]
+        sec_photon = sec_run.m_create(Method).m_create(Photon)
+        # several spectra can refer to the same photon file, which is then parsed only once
+        photon = self._photon_cache.get(photon_file[0])
+        if photon is None:
+            self.photon_parser.mainfile = os.path.join(self.maindir, photon_file[0])
+            photon = (
+                self.photon_parser.get('operator'), self.photon_parser.get('vectors'),
+                self.photon_parser.get('photon_energy'))
+            self._photon_cache[photon_file[0]] = photon
+        operator, vectors, photon_energy = photon
+        sec_photon.multipole_type = operator
+        sec_photon.polarization = vectors[0]
         if sec_photon.multipole_type in ['quad', 'NRIXS', 'qRaman']:
-            sec_photon.momentum_transfer = self.photon_parser.get('vectors')[1]
-        sec_photon.energy = self.photon_parser.get('photon_energy') * ureg.electron_volt
+            sec_photon.momentum_transfer = vectors[1]
+        sec_photon.energy = photon_energy * ureg.electron_volt
 
     def parse_method(self, archive):
         sec_run = archive.run[-1]
@@ -118,59 +146,73 @@ class OceanParser:
         if sec_run.m_xpath('method[0].photon'):
             sec_method.starting_method_ref = sec_run.method[0]
 
-        # KMesh section
-        sec_k_mesh = sec_method.m_create(KMesh)
-        sec_k_mesh.grid = self.data['bse'].get('kmesh')
-
-        # BSE section
-        sec_bse = sec_method.m_create(BSE)
-        sec_bse.n_empty_states = self.data['bse'].get('nbands')
-        # screening parsing
-        sec_bse.screening_type = self.data['screen'].get('mode')
-        sec_bse.dielectric_infinity = self.data['structure'].get('epsilon')
-        sec_bse.n_empty_states_screening = self.data['screen'].get('nbands')
-        sec_bse.k_mesh_screening = KMesh(grid=self.data['screen'].get('kmesh'))
-
-        # code-specific parameters
-        # BSE
-        sec_bse_ocean = sec_method.m_create(x_ocean_bse_parameters)
-        sec_bse_ocean.x_ocean_screen_radius = self.data['bse']['core'].get('screen_radius')
-        sec_bse_ocean.x_ocean_xmesh = self.data['bse'].get('xmesh')
-        if sec_bse.type == 'lanczos-haydock':
-            sec_haydock = sec_bse_ocean.m_create(x_ocean_core_haydock_parameters)
-            sec_haydock.x_ocean_converge_spacing = self.data['bse']['core']['haydock']['converge'].get('spacing')
-            sec_haydock.x_ocean_converge_thresh = self.data['bse']['core']['haydock']['converge'].get('thresh')
-            sec_haydock.x_ocean_niter = self.data['bse']['core']['haydock'].get('niter')
-        elif sec_bse.type == 'gmres':
-            sec_gmres = sec_bse_ocean.m_create(x_ocean_core_gmres_parameters)
-            gmres_keys = ['echamp', 'elist', 'erange', 'estyle', 'ffff', 'gprc', 'nloop']
-            for key in gmres_keys:
-                setattr(sec_gmres, f'x_ocean_{key}', self.data['bse']['core']['gmres'].get(key))
+        bse_data = self.data.get('bse')
+        core_data = bse_data.get('core') if bse_data else None
+        screen_data = self.data.get('screen')
+
+        sec_bse = None
+        if bse_data:
+            # KMesh section
+            sec_k_mesh = sec_method.m_create(KMesh)
+            sec_k_mesh.grid = bse_data.get('kmesh')
+
+            # BSE section
+            sec_bse = sec_method.m_create(BSE)
+            sec_bse.n_empty_states = bse_data.get('nbands')
+            sec_bse.dielectric_infinity = (self.data.get('structure') or {}).get('epsilon')
+            # screening parsing
+            if screen_data:
+                sec_bse.screening_type = screen_data.get('mode')
+                sec_bse.n_empty_states_screening = screen_data.get('nbands')
+                sec_bse.k_mesh_screening = KMesh(grid=screen_data.get('kmesh'))
+
+            # code-specific parameters
+            # BSE
+            sec_bse_ocean = sec_method.m_create(x_ocean_bse_parameters)
+            sec_bse_ocean.x_ocean_xmesh = bse_data.get('xmesh')
+            if core_data:
+                sec_bse_ocean.x_ocean_screen_radius = core_data.get('screen_radius')
+                if sec_bse.type == 'lanczos-haydock' and core_data.get('haydock'):
+                    sec_haydock = sec_bse_ocean.m_create(x_ocean_core_haydock_parameters)
+                    haydock_data = core_data['haydock']
+                    sec_haydock.x_ocean_converge_spacing = haydock_data['converge'].get('spacing')
+                    sec_haydock.x_ocean_converge_thresh = haydock_data['converge'].get('thresh')
+                    sec_haydock.x_ocean_niter = haydock_data.get('niter')
+                elif sec_bse.type == 'gmres' and core_data.get('gmres'):
+                    sec_gmres = sec_bse_ocean.m_create(x_ocean_core_gmres_parameters)
+                    gmres_keys = ['echamp', 'elist', 'erange', 'estyle', 'ffff', 'gprc', 'nloop']
+                    gmres_data = core_data['gmres']
+                    sec_gmres.m_update(**{f'x_ocean_{key}': gmres_data.get(key) for key in gmres_keys})
         # screening
-        sec_bse_screen = sec_method.m_create(x_ocean_screen_parameters)
-        screen_keys = [
-            'all_augment', 'augment', 'convertstyle', 'dft_energy_range', 'inversionstyle',
-            'kshift', 'mimic_exciting_bands', 'shells']
-        screen_dicts = [
-            'core_offset', 'final', 'grid']
-        for key in screen_keys:
-            setattr(sec_bse_screen, f'x_ocean_{key}', self.data['screen'].get(key))
-        for keys in screen_dicts:
-            for subkeys in self.data['screen'][keys].keys():
-                setattr(sec_bse_screen, f'x_ocean_{keys}_{subkeys}', self.data['screen'][keys].get(subkeys))
-        sec_bse_screen.x_ocean_model_flavor = self.data['screen']['model'].get('flavor')
+        if screen_data:
+            sec_bse_screen = sec_method.m_create(x_ocean_screen_parameters)
+            screen_keys = [
+                'all_augment', 'augment', 'convertstyle', 'dft_energy_range', 'inversionstyle',
+                'kshift', 'mimic_exciting_bands', 'shells']
+            screen_dicts = [
+                'core_offset', 'final', 'grid']
+            screen_values = {f'x_ocean_{key}': screen_data.get(key) for key in screen_keys}
+            screen_values.update({
+                f'x_ocean_{keys}_{subkey}': value for keys in screen_dicts
+                for subkey, value in screen_data.get(keys, {}).items()})
+            screen_values['x_ocean_model_flavor'] = screen_data.get('model', {}).get('flavor')
+            # sub-keys not defined in the metainfo are skipped
+            sec_bse_screen.m_update(m_ignore_additional_keys=True, **screen_values)
         # edges
-        edges = []
-        for ed in [x.split(' ') for x in self.data['calc'].get('edges', [])]:
-            edges.append([int(x) for x in ed])
+        edges = np.array([
+            [int(x) for x in ed.split()] for ed in (self.data.get('calc') or {}).get('edges', [])], dtype=int)
+        if len(edges) == 0:
+            return
         sec_method.x_ocean_edges = edges
 
         # Core-Hole (either K=1s or L23=2p depenging on the first edge found)
+        if sec_bse is None or not core_data:
+            return
         sec_core_hole = sec_bse.m_create(CoreHole)
-        sec_core_hole.mode = self.mode_bse[self.data['bse']['core'].get('strength')]
-        sec_core_hole.solver = self._type_bse_map[self.data['bse']['core'].get('solver')]
-        sec_core_hole.edge = self._core_level_map[str(edges[0][-2:])]
-        sec_core_hole.broadening = self.data['bse']['core'].get('broaden')
+        sec_core_hole.mode = self.mode_bse[core_data.get('strength')]
+        sec_core_hole.solver = self._type_bse_map[core_data.get('solver')]
+        sec_core_hole.edge = self._core_level_map[tuple(edges[0][-2:].tolist())]
+        sec_core_hole.broadening = core_data.get('broaden')
 
     def parse_scc(self, path):
         sec_run = self._child_archives.get(path).run[-1]
@@ -179,29 +221,30 @@ class OceanParser:
         sec_scc.method_ref = sec_run.method[-1]  # ref to BSE method section
 
         # absorption spectra (main calculation)
-        self.spectra_parser.mainfile = os.path.join(self.maindir, path)
-        data_spct = self.spectra_parser.data
+        # only the energies and the total spectrum columns are used
+        data_spct = np.loadtxt(os.path.join(self.maindir, path), usecols=(0, 2), ndmin=2)
         sec_spectra = sec_scc.m_create(Spectra)
         sec_spectra.type = self.data['calc'].get('mode').upper()
         sec_spectra.n_energies = len(data_spct)
-        sec_spectra.excitation_energies = data_spct[:, 0] * ureg.eV
-        sec_spectra.intensities = data_spct[:, 2]
+        sec_spectra.excitation_energies = ureg.Quantity(data_spct[:, 0], ureg.eV)
+        sec_spectra.intensities = data_spct[:, 1]
 
         # lanczos matrices
-        lanc_file = [f for f in os.listdir(self.maindir) if f.startswith('abslanc') and f.endswith(path[-2:])]
+        lanc_file = [f for f in self._maindir_files['abslanc'] if f.endswith(path[-2:])]
         if len(lanc_file) == 0:
             return
-        self.lanczos_parser.mainfile = os.path.join(self.maindir, lanc_file[0])
-        data_lancz = self.lanczos_parser.get('data')
+        # abslanc files are plain numeric tables with a ragged header (n_iterations, scaling
+        # factor), followed by the first diagonal element, the tridiagonal rows and the eigenvalues
+        with open(os.path.join(self.maindir, lanc_file[0])) as f:
+            data_lancz = f.readlines()
+        n_iterations, scaling_factor = np.fromstring(data_lancz[0], sep=' ')
         sec_lanczos = sec_scc.m_create(x_ocean_lanczos_results)
-        n_dimension = int(data_lancz[0][0]) + 1
+        n_dimension = int(n_iterations) + 1
         sec_lanczos.x_ocean_n_tridiagonal_matrix = n_dimension
-        sec_lanczos.x_ocean_scaling_factor = data_lancz[0][1]
-        matrix = [[data_lancz[1], 0.0]]
-        for n in range(2, n_dimension + 1):
-            matrix.append([data_lancz[n][0], data_lancz[n][1]])
-        sec_lanczos.x_ocean_tridiagonal_matrix = matrix
-        sec_lanczos.x_ocean_eigenvalues = data_lancz[n_dimension + 1:]
+        sec_lanczos.x_ocean_scaling_factor = scaling_factor
+        sec_lanczos.x_ocean_tridiagonal_matrix = np.vstack([
+            [float(data_lancz[1]), 0.0], np.loadtxt(data_lancz[2:n_dimension + 1], ndmin=2)])
+        sec_lanczos.x_ocean_eigenvalues = np.loadtxt(data_lancz[n_dimension + 1:], ndmin=2)
 
     def parse_spectra_entries(self, path):
         # For each spectra, we parse the data in one entry
@@ -234,9 +277,10 @@ class OceanParser:
     def parse_photon_workflow(self, photon_archive, photon_workflow_archive):
         sec_run = photon_workflow_archive.m_create(Run)
         if photon_archive:
-            if photon_archive[0].run[-1].m_xpath('program') and photon_archive[0].run[-1].m_xpath('system'):
-                sec_run.program = photon_archive[0].run[-1].program
-                sec_run.system = photon_archive[0].run[-1].system
+            first_run = photon_archive[0].run[-1]
+            if first_run.m_xpath('program') and first_run.m_xpath('system'):
+                sec_run.program = first_run.program
+                sec_run.system = first_run.system
         else:
             self.logger.warning('Cannot resolve program and system from the first photon archive. '
                                 'Generating empty sections.')
@@ -257,29 +301,30 @@ class OceanParser:
             Link(name='Input BSE methodology', section=input_method)]
         spectra = []
         outputs = []
-        for archive in photon_archive:
+        add_task, add_spectrum, add_output = workflow.tasks.append, spectra.append, outputs.append
+        for index, archive in enumerate(photon_archive):
             if archive.workflow2:
-                index = photon_archive.index(archive)
+                archive_run = archive.run[-1]
                 task = TaskReference(task=archive.workflow2)
-                input_photon_method = archive.run[-1].method[0]
+                input_photon_method = archive_run.method[0] if archive_run.m_xpath('method[0].photon') else None
                 if input_structure and input_photon_method:
                     task.inputs = [
                         Link(name='Input structure', section=input_structure),
                         Link(name='Input photon parameters', section=input_photon_method)]
-                output_calculation = archive.run[-1].calculation[-1]
+                output_calculation = archive_run.calculation[-1] if archive_run.calculation else None
                 if output_calculation:
                     task.outputs = [Link(name=f'Output polarization {index + 1}', section=output_calculation)]
-                    spectra.append(output_calculation.spectra[0])
-                    outputs.append(Link(name=f'Output polarization {index + 1}', section=output_calculation))
-                workflow.tasks.append(task)
+                    add_spectrum(output_calculation.spectra[0])
+                    add_output(Link(name=f'Output polarization {index + 1}', section=output_calculation))
+                add_task(task)
         workflow.outputs = outputs
         workflow.results.spectrum_polarization = spectra
         photon_workflow_archive.workflow2 = workflow
 
     def get_mainfile_keys(self, filepath):
         # We recognize the absspct files as the main auxiliary files
-        absspct_files = [f for f in os.listdir(os.path.dirname(filepath)) if f.startswith('absspct')]
-        absspct_files.sort()
+        with os.scandir(os.path.dirname(filepath) or os.curdir) as entries:
+            absspct_files = sorted(entry.name for entry in entries if entry.name.startswith('absspct'))
         if len(absspct_files) > 0:
             keys = []
             for f in absspct_files:
@@ -292,21 +337,40 @@ class OceanParser:
         self.maindir = os.path.dirname(self.filepath)
         self.logger = logger if logger is not None else logging
 
+        self._photon_cache = {}
+
         photon_workflow_archive = archive  # archive will be passed as the PhotonPolarization workflow
 
         try:
-            data = json.load(open(self.filepath))
+            with open(self.filepath, 'rb') as f:
+                content = f.read()
+            try:
+                data = orjson.loads(content)
+            except orjson.JSONDecodeError:
+                # orjson rejects the NaN and Infinity literals accepted by json
+                data = json.loads(content)
         except Exception:
             self.logger.error('Error opening json output file.')
             data = None
             return
         self.data = data
 
+        children = [child for child in self._child_archives if self._child_archives.get(child)]
+        if children:
+            # list the auxiliary files in the main directory only once, grouped by prefix
+            self._maindir_files = {'photon': [], 'abslanc': []}
+            with os.scandir(self.maindir or os.curdir) as entries:
+                for entry in entries:
+                    for prefix, files in self._maindir_files.items():
+                        if entry.name.startswith(prefix):
+                            files.append(entry.name)
+                            break
+            for files in self._maindir_files.values():
+                files.sort()
+
         photon_archive = []
-        for child in self._child_archives:
-            if self._child_archives.get(child):
-                # index = child[-2:]
-                self.parse_spectra_entries(child)
-                photon_archive.append(self._child_archives.get(child))
+        for child in children:
+            self.parse_spectra_entries(child)
+            photon_archive.append(self._child_archives.get(child))
 
         self.parse_photon_workflow(photon_archive, photon_workflow_archive)
@@ -17,10 +17,13 @@
 #
 
 import pytest
+import json
 import numpy as np
 
 from nomad.datamodel import EntryArchive
+from nomad.datamodel.metainfo.simulation.run import Run
 from electronicparsers.ocean import OceanParser
+from electronicparsers.ocean.parser import PhotonParser
 
 
 def approx(value, abs=0, rel=1e-6):
@@ -55,9 +58,142 @@ def test_tio2(parser):
     assert sec_bse.core_hole.mode == 'absorption'
     assert sec_bse.core_hole.broadening.magnitude == approx(0.89)
     sec_ocean_screen = sec_method[-1].x_ocean_screen
-    assert sec_ocean_screen.m_mod_count == 22
+    assert len(sec_ocean_screen.m_to_dict()) == 21
+    assert sec_ocean_screen.x_ocean_convertstyle == 'intp'
+    assert sec_ocean_screen.x_ocean_core_offset_energy == '225.10'
+    assert sec_ocean_screen.x_ocean_grid_lmax == 2
+    assert sec_ocean_screen.x_ocean_model_flavor == 'SLL'
     assert sec_ocean_screen.x_ocean_dft_energy_range == approx(150.0)
 
     # Calculation
     sec_scc = sec_run.calculation
     assert len(sec_scc) == 0  # Calculation not populated in workflow2\
+
+
+def test_tio2_spectra():
+    # Testing the spectra entries, with the child archives resolved from the absspct files.
+    parser = OceanParser()
+    mainfile = 'tests/data/ocean/ms-10734/Spectra-1-1-1/postDefaultsOceanDatafile'
+    keys = parser.get_mainfile_keys(mainfile)
+    assert keys == ['absspct_Ti.0001_1s_01', 'absspct_Ti.0001_1s_02', 'absspct_Ti.0001_1s_03']
+    parser._child_archives = {key: EntryArchive() for key in keys}
+    archive = EntryArchive()
+    parser.parse(mainfile, archive, None)
+
+    assert archive.workflow2.results.n_polarizations == 3
+    assert len(archive.workflow2.tasks) == 3
+    assert len(archive.workflow2.outputs) == 3
+    assert len(archive.workflow2.results.spectrum_polarization) == 3
+    assert archive.workflow2.tasks[1].inputs[1].name == 'Input photon parameters'
+
+    sec_run = parser._child_archives['absspct_Ti.0001_1s_02'].run[-1]
+    # System
+    sec_atoms = sec_run.system[-1].atoms
+    assert sec_atoms.labels == ['Ti', 'Ti', 'Ti', 'Ti', 'O', 'O', 'O', 'O', 'O']
+    assert sec_atoms.periodic == [True, True, True]
+    assert sec_atoms.lattice_vectors[0][2].magnitude == approx(2.09388e-10)
+    assert sec_atoms.lattice_vectors_reciprocal[0][1].magnitude == approx(9.46542248e+09)
+    assert sec_atoms.positions[4].magnitude == approx([1.91712396e-10, -1.85367197e-11, 5.06631668e-11])
+
+    # Method
+    sec_photon = sec_run.method[0].photon[0]
+    assert sec_photon.multipole_type == 'dipole'
+    assert (sec_photon.polarization == np.array([0, 1, 0])).all()
+    assert sec_photon.energy.to('eV').magnitude == approx(4966)
+    assert sec_run.method[-1].starting_method_ref == sec_run.method[0]
+
+    # Calculation
+    sec_scc = sec_run.calculation[-1]
+    sec_spectra = sec_scc.spectra[0]
+    assert sec_spectra.type == 'XAS'
+    assert sec_spectra.n_energies == 1001
+    assert sec_spectra.excitation_energies[0].to('eV').magnitude == approx(-20.0)
+    assert sec_spectra.excitation_energies[-1].to('eV').magnitude == approx(80.0)
+    assert sec_spectra.intensities[0] == approx(9.8550022e-09)
+    assert sec_spectra.intensities[-1] == approx(9.0919137e-09)
+    sec_lanczos = sec_scc.x_ocean_lanczos[0]
+    assert sec_lanczos.x_ocean_n_tridiagonal_matrix == 69
+    assert sec_lanczos.x_ocean_scaling_factor == approx(8.657871834986375e-07)
+    assert sec_lanczos.x_ocean_tridiagonal_matrix.shape == (69, 2)
+    assert sec_lanczos.x_ocean_tridiagonal_matrix[0] == approx([1.06386782, 0.0])
+    assert sec_lanczos.x_ocean_tridiagonal_matrix[1] == approx([1.14406592, 0.35480383])
+    assert sec_lanczos.x_ocean_eigenvalues.shape == (69, 3)
+    assert sec_lanczos.x_ocean_eigenvalues[-1] == approx([69, 69, 1.7299515931])
+
+    sec_lanczos = parser._child_archives['absspct_Ti.0001_1s_01'].run[-1].calculation[-1].x_ocean_lanczos[0]
+    assert sec_lanczos.x_ocean_n_tridiagonal_matrix == 70
+    assert sec_lanczos.x_ocean_tridiagonal_matrix[-1] == approx([0.0, 0.15388327])
+    assert sec_lanczos.x_ocean_eigenvalues[0] == approx([1, 70, -0.0406681598])
+
+
+def test_missing_blocks(parser, tmp_path):
+    # Testing that no method sections are created for missing bse and screen blocks.
+    with open('tests/data/ocean/ms-10734/Spectra-1-1-1/postDefaultsOceanDatafile') as f:
+        data = json.load(f)
+    del data['bse'], data['screen']
+    mainfile = tmp_path / 'postDefaultsOceanDatafile'
+    mainfile.write_text(json.dumps(data))
+    archive = EntryArchive()
+    parser.parse(str(mainfile), archive, None)
+
+    sec_method = archive.run[-1].method
+    assert len(sec_method) == 1
+    assert sec_method[-1].k_mesh is None
+    assert sec_method[-1].bse is None
+    assert sec_method[-1].x_ocean_bse is None
+    assert sec_method[-1].x_ocean_screen is None
+    assert len(sec_method[-1].x_ocean_edges) > 0
+
+
+def test_nan_literals(parser, tmp_path):
+    # Testing that the non-standard NaN and Infinity json literals are still decoded.
+    with open('tests/data/ocean/ms-10734/Spectra-1-1-1/postDefaultsOceanDatafile') as f:
+        data = json.load(f)
+    data['warnings'] = [float('nan'), float('inf')]
+    mainfile = tmp_path / 'postDefaultsOceanDatafile'
+    mainfile.write_text(json.dumps(data))
+    archive = EntryArchive()
+    parser.parse(str(mainfile), archive, None)
+
+    assert archive.run[-1].method[-1].bse.n_empty_states == data['bse']['nbands']
+
+
+def test_system():
+    parser = OceanParser()
+    archive = EntryArchive()
+    archive.m_create(Run)
+    parser._child_archives = {'absspct_Ti.0001_1s_01': archive}
+    parser.parse_system('absspct_Ti.0001_1s_01', {
+        'znucl': [8.0, 22.0], 'typat': [2, 1, 1],
+        'xangst': [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]})
+
+    sec_atoms = archive.run[-1].system[-1].atoms
+    assert sec_atoms.labels == ['Ti', 'O', 'O']
+    assert all(type(label) is str for label in sec_atoms.labels)
+    assert sec_atoms.periodic is None
+    assert sec_atoms.lattice_vectors is None
+    assert sec_atoms.positions.shape == (3, 3)
+
+
+def test_photon(tmp_path):
+    photon_file = tmp_path / 'photon1'
+    photon_file.write_text('quad\ncartesian -0.5 0.0 0.1\nend\ncartesian 0.0 1.0 0.0\nend\n4966\n')
+    photon_parser = PhotonParser()
+    photon_parser.mainfile = str(photon_file)
+    assert photon_parser.get('operator') == 'quad'
+    vectors = photon_parser.get('vectors')
+    assert len(vectors) == 2
+    assert vectors[0] == approx([-0.5, 0.0, 0.1])
+    assert vectors[1] == approx([0.0, 1.0, 0.0])
+    assert photon_parser.get('photon_energy') == approx(4966)
+
+    # leading comment, bare cartesian line and exponents
+    photon_file = tmp_path / 'photon2'
+    photon_file.write_text('# photon\nNRIXS\ncartesian\ncartesian 1.0E-01 -2.5e+00 0\nend\ncartesian 0 0 1\nend\n4966.5\n')
+    photon_parser.mainfile = str(photon_file)
+    assert photon_parser.get('operator') == 'NRIXS'
+    vectors = photon_parser.get('vectors')
+    assert len(vectors) == 2
+    assert vectors[0] == approx([0.1, -2.5, 0.0])
+    assert vectors[1] == approx([0.0, 0.0, 1.0])
+    assert photon_parser.get('photon_energy') == approx(4966.5)